@@ -0,0 +1,64 @@
+"""
+Authorization cost per request: UUID token looked up in database vs HMAC-signed token.
+
+    DB_URL=sqlite:////tmp/bench.sqlite STORAGE_PATH=/tmp python -m benchmarks.authorize --requests 10000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import insert, delete
+
+from src import config
+from src.entities import Role
+from src.main import create_db_engine
+from src.middlewares.db_transaction import db_transaction
+from src.services.auth import AuthService, generate_token, generate_signed_token
+from src.tables import create_schema, users, user_tokens
+
+
+async def measure(engine, token: str, requests: int) -> list[float]:
+    timings = []
+    async with db_transaction(engine):
+        service = AuthService()
+        for _ in range(requests):
+            started = time.perf_counter()
+            auth = await service.authorize(token)
+            timings.append(time.perf_counter() - started)
+            assert auth.is_authorized
+    return timings
+
+
+async def main(args: argparse.Namespace) -> None:
+    if not config.AUTH_TOKEN_SECRET:
+        config.AUTH_TOKEN_SECRET = b"benchmark-secret"
+
+    engine = create_db_engine(echo=False)
+    await create_schema(engine)
+
+    async with engine.begin() as conn:
+        user_id = await conn.scalar(
+            insert(users).values(first_name="Bench", last_name="Mark", role=Role.USER).returning(users.c.id)
+        )
+        uuid_token = generate_token()
+        await conn.execute(insert(user_tokens).values(user_id=user_id, token=uuid_token))
+    signed_token = generate_signed_token(user_id, Role.USER)
+
+    for name, token in {"uuid (db lookup)": uuid_token, "signed (hmac)": signed_token}.items():
+        timings = await measure(engine, token, args.requests)
+        print(
+            f"{name:>16}: mean {statistics.mean(timings) * 1e6:9.1f} us, "
+            f"p99 {statistics.quantiles(timings, n=100)[98] * 1e6:9.1f} us"
+        )
+
+    async with engine.begin() as conn:
+        await conn.execute(delete(user_tokens).where(user_tokens.c.user_id == user_id))
+        await conn.execute(delete(users).where(users.c.id == user_id))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""
+Rows to entities mapping: lookups by column name with copying to RatedPost vs positional RowMapper.
+
+    DB_URL=sqlite:// STORAGE_PATH=/tmp python -m benchmarks.mapping --rows 10000
+"""
+import argparse
+import timeit
+from datetime import datetime as Datetime
+
+import sqlalchemy as sa
+
+from src.entities import Post, RatedPost, RateKind
+from src.mapping import RowMapper, enum_converter
+from src.tables import metadata, posts
+
+
+def record_to_post(r) -> Post:
+    return Post(
+        id=r._mapping["id"],
+        created_at=r._mapping["created_at"],
+        text=r._mapping["text"],
+        image_url=r._mapping["image_url"],
+        likes_quantity=r._mapping["likes_quantity"],
+        dislikes_quantity=r._mapping["dislikes_quantity"],
+    )
+
+
+def map_by_names(rows, rates) -> list[RatedPost]:
+    mapped = [record_to_post(r) for r in rows]
+    return [
+        RatedPost(
+            id=post.id,
+            created_at=post.created_at,
+            text=post.text,
+            image_url=post.image_url,
+            likes_quantity=post.likes_quantity,
+            dislikes_quantity=post.dislikes_quantity,
+            rate=RateKind(rates[post.id].lower()) if post.id in rates else None,
+        )
+        for post in mapped
+    ]
+
+
+def map_positionally(mapper, convert, keys, rows, rates) -> list[RatedPost]:
+    mapped = mapper.map(keys, rows)
+    for post in mapped:
+        post.rate = convert(rates.get(post.id))
+    return mapped
+
+
+def main(args: argparse.Namespace) -> None:
+    engine = sa.create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            sa.insert(posts),
+            [
+                {
+                    "created_at": Datetime(2024, 1, 1),
+                    "text": f"Post {i}",
+                    "image_url": f"/storage/{i}.jpeg",
+                    "likes_quantity": i % 100,
+                    "dislikes_quantity": i % 10,
+                }
+                for i in range(args.rows)
+            ],
+        )
+        result = conn.execute(sa.select(posts))
+        keys, rows = tuple(result.keys()), result.all()
+
+    rates = {i: ("LIKE" if i % 2 else "DISLIKE") for i in range(0, args.rows, 3)}
+    mapper = RowMapper(RatedPost)
+    convert = enum_converter(RateKind)
+
+    assert map_by_names(rows, rates) == map_positionally(mapper, convert, keys, rows, rates)
+
+    for name, func in {
+        "by names + copy": lambda: map_by_names(rows, rates),
+        "positional": lambda: map_positionally(mapper, convert, keys, rows, rates),
+    }.items():
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f"{name:>16}: {best * 1000:8.2f} ms per {args.rows} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
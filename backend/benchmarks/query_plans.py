@@ -0,0 +1,146 @@
+"""
+Query plans regression check for hot queries of PostsService and AuthService.
+
+Runs service calls against seeded database (see benchmarks.seed) inside transaction which is rolled back,
+captures executed statements and their EXPLAIN plans. Exits with code 1 if any plan contains
+sequential scan of a table not explicitly allowed for that call.
+
+    DB_URL=sqlite:////tmp/seed.sqlite STORAGE_PATH=/tmp python -m benchmarks.query_plans
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.entities import RateKind
+from src.main import create_db_engine
+from src.middlewares.db_transaction import db_transaction, get_db_conn
+from src.services.auth import AuthService
+from src.services.posts import PostsService, PostsSorter
+from src.tables import post_rates
+
+# Calls which scan whole table by their nature
+ALLOWED_SEQ_SCANS = {
+    "PostsService.get_total_quantity": {"posts"},
+}
+
+
+class Rollback(Exception):
+    ...
+
+
+class StatementsCapture:
+    def __init__(self):
+        self.label = ""
+        self.statements: list[tuple[str, str, tuple | dict]] = []
+        self.enabled = True
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled and not executemany and statement.lstrip().split()[0].upper() in {"SELECT", "UPDATE", "DELETE"}:
+            self.statements.append((self.label, statement, parameters))
+
+
+async def run_hot_calls(capture: StatementsCapture, args: argparse.Namespace) -> None:
+    auth_service, posts_service = AuthService(), PostsService()
+
+    capture.label = "AuthService.login"
+    login = await auth_service.login(args.login, args.password)
+    capture.label = "AuthService.authorize"
+    await auth_service.authorize(login.token)
+
+    for order in PostsSorter:
+        capture.label = f"PostsService.get_list[{order.value}]"
+        page = await posts_service.get_list(limit=20, offset=0, order=order)
+        capture.label = "PostsService.get_rates"
+        await posts_service.get_rates(*(p.id for p in page), user_id=login.user_id)
+
+    # Feed pages rarely contain rated posts, so rates of rated ones are requested explicitly
+    capture.enabled = False
+    rated_ids = (
+        await get_db_conn().scalars(
+            sa.select(post_rates.c.post_id).where(post_rates.c.user_id == login.user_id).limit(20)
+        )
+    ).all()
+    capture.enabled = True
+    capture.label = "PostsService.get_rates"
+    await posts_service.get_rates(*rated_ids, user_id=login.user_id)
+
+    capture.label = "PostsService.get_total_quantity"
+    await posts_service.get_total_quantity()
+
+    capture.label = "PostsService.search"
+    await posts_service.search(args.query, limit=20, user_id=login.user_id)
+
+    capture.label = "PostsService.update_user_rate"
+    await posts_service.update_user_rate(page[0].id, login.user_id, RateKind.LIKE)
+
+    capture.label = "PostsService.rescore_hot"
+    await posts_service.rescore_hot()
+
+
+async def explain(conn: AsyncConnection, statement: str, parameters) -> tuple[list[str], str]:
+    """Returns sequentially scanned tables and printable plan."""
+    if conn.dialect.name == "postgresql":
+        plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+
+        scanned, nodes = [], [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan":
+                scanned.append(node["Relation Name"])
+            nodes.extend(node.get("Plans", []))
+        return scanned, json.dumps(plan, indent=1)
+
+    details = [row[-1] for row in await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+    scanned = [
+        detail.split()[1]
+        for detail in details
+        # "SCAN t USING [COVERING] INDEX i", virtual (FTS) tables scans and constant rows are fine
+        if detail.startswith("SCAN ") and not any(s in detail for s in ("USING", "VIRTUAL TABLE", "CONSTANT ROW"))
+    ]
+    return scanned, "\n".join(details)
+
+
+async def main(args: argparse.Namespace) -> int:
+    engine = create_db_engine(echo=False)
+    capture = StatementsCapture()
+    sa.event.listen(engine.sync_engine, "before_cursor_execute", capture)
+
+    failures = 0
+    try:
+        async with db_transaction(engine) as conn:
+            await run_hot_calls(capture, args)
+            capture.enabled = False
+
+            for label, statement, parameters in capture.statements:
+                scanned, plan = await explain(conn, statement, parameters)
+                regressions = set(scanned) - ALLOWED_SEQ_SCANS.get(label, set())
+                status = f"SEQ SCAN {', '.join(sorted(regressions))}" if regressions else "ok"
+                failures += bool(regressions)
+
+                print(f"[{status}] {label}")
+                if regressions or args.verbose:
+                    print(f"{statement}\n{plan}\n")
+
+            # Changes made by service calls are not kept
+            raise Rollback()
+    except Rollback:
+        pass
+    finally:
+        await engine.dispose()
+
+    print(f"{len(capture.statements)} statements checked, {failures} with sequential scans.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--login", default="user1")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--query", default="кот")
+    parser.add_argument("--verbose", action="store_true")
+    sys.exit(asyncio.run(main(parser.parse_args())))
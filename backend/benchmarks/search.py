@@ -0,0 +1,111 @@
+"""
+Full-text posts search benchmark.
+
+Seeds database from DB_URL with synthetic posts corpus and measures latency of
+PostsService.search for the first page and following keyset pages.
+
+    DB_URL=sqlite:////tmp/bench.sqlite STORAGE_PATH=/tmp python -m benchmarks.search --posts 1000000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import sqlalchemy as sa
+from sqlalchemy import insert, select
+from sqlalchemy.sql.functions import count
+
+from src.main import create_db_engine
+from src.middlewares.db_transaction import db_transaction
+from src.services.posts import PostsService, SearchCursor
+from src.tables import create_schema, posts
+
+VOCABULARY_SIZE = 50_000
+WORDS_PER_POST = (5, 40)
+BATCH_SIZE = 10_000
+
+
+def make_vocabulary(rnd: random.Random) -> list[str]:
+    alphabet = "абвгдеёжзийклмнопрстуфхцчшщэюя"
+    return ["".join(rnd.choices(alphabet, k=rnd.randint(3, 10))) for _ in range(VOCABULARY_SIZE)]
+
+
+async def seed(engine, posts_quantity: int, vocabulary: list[str], rnd: random.Random) -> None:
+    async with engine.begin() as conn:
+        existing = await conn.scalar(select(count(posts.c.id)))
+    if existing >= posts_quantity:
+        print(f"Corpus already contains {existing} posts.")
+        return
+
+    started = time.perf_counter()
+    for batch_start in range(existing, posts_quantity, BATCH_SIZE):
+        batch_end = min(batch_start + BATCH_SIZE, posts_quantity)
+        rows = [
+            {
+                # Zipf-like distribution makes frequent and rare terms
+                "text": " ".join(
+                    vocabulary[int(rnd.paretovariate(1.0)) % VOCABULARY_SIZE]
+                    for _ in range(rnd.randint(*WORDS_PER_POST))
+                ),
+                "image_url": "/storage/benchmark.jpeg",
+            }
+            for _ in range(batch_start, batch_end)
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(posts), rows)
+
+    async with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            await conn.execute(sa.text("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')"))
+        else:
+            await conn.execute(sa.text("ANALYZE posts"))
+
+    print(f"Seeded {posts_quantity - existing} posts in {time.perf_counter() - started:.1f}s.")
+
+
+async def measure(engine, query: str, pages: int, per_page: int) -> list[float]:
+    timings = []
+    after = None
+    for _ in range(pages):
+        started = time.perf_counter()
+        async with db_transaction(engine):
+            found = await PostsService().search(query, limit=per_page, user_id=0, after=after)
+        timings.append(time.perf_counter() - started)
+
+        if len(found) < per_page:
+            break
+        after = SearchCursor(found[-1].rank, found[-1].post.id)
+    return timings
+
+
+async def main(args: argparse.Namespace) -> None:
+    rnd = random.Random(args.seed)
+    vocabulary = make_vocabulary(rnd)
+
+    engine = create_db_engine(echo=False)
+    await create_schema(engine)
+    await seed(engine, args.posts, vocabulary, rnd)
+
+    queries = {
+        "frequent term": vocabulary[1],
+        "rare term": vocabulary[VOCABULARY_SIZE // 2],
+        "two terms": f"{vocabulary[1]} {vocabulary[2]}",
+    }
+    for name, query in queries.items():
+        timings = await measure(engine, query, args.pages, args.per_page)
+        print(
+            f"{name:>14}: first page {timings[0] * 1000:8.2f} ms, "
+            f"median of {len(timings)} pages {statistics.median(timings) * 1000:8.2f} ms"
+        )
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
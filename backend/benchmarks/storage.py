@@ -0,0 +1,68 @@
+"""
+Storage files serving: FileResponse (sendfile, ranges, caching headers) vs reading whole file into response body.
+
+    DB_URL=sqlite:// STORAGE_PATH=/tmp/storage python -m benchmarks.storage --size 512 --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import aiohttp
+from aiohttp import web
+
+from src import config
+from src.controllers.storage import router as storage_router
+
+
+async def get_plain_file(request: web.Request) -> web.Response:
+    path = config.STORAGE_PATH / request.match_info["file_name"]
+    return web.Response(body=path.read_bytes(), content_type="image/jpeg")
+
+
+async def measure(url: str, requests: int, concurrency: int) -> float:
+    async with aiohttp.ClientSession() as session:
+
+        async def worker(quantity: int) -> None:
+            for _ in range(quantity):
+                async with session.get(url) as response:
+                    await response.read()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+
+async def main(args: argparse.Namespace) -> None:
+    config.STORAGE_PATH.mkdir(parents=True, exist_ok=True)
+    file_name = "benchmark.jpeg"
+    (config.STORAGE_PATH / file_name).write_bytes(os.urandom(args.size * 1024))
+
+    app = web.Application()
+    app.add_routes(storage_router)
+    app.router.add_get("/plain/{file_name}", get_plain_file)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.port)
+    await site.start()
+
+    try:
+        for name, path in {"sendfile": "/storage", "plain read": "/plain"}.items():
+            elapsed = await measure(f"http://127.0.0.1:{args.port}{path}/{file_name}", args.requests, args.concurrency)
+            print(
+                f"{name:>10}: {args.requests / elapsed:8.0f} req/s, "
+                f"{args.requests * args.size / 1024 / elapsed:8.1f} MB/s"
+            )
+    finally:
+        await runner.cleanup()
+        os.remove(config.STORAGE_PATH / file_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=512, help="file size, KB")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(main(parser.parse_args()))
@@ -1,3 +1,4 @@
+import ipaddress
 import os
 from pathlib import Path
 
@@ -8,3 +9,69 @@ PASSWORD_HASH_LENGTH = 128
 PASSWORD_HASH_ITERATIONS = 10000
 
 STORAGE_PATH = Path(os.environ["STORAGE_PATH"])
+
+# "Hot" posts ranking: score = (likes - dislikes + 1) / (age_hours + 2) ** gravity
+HOT_SCORE_GRAVITY = float(os.environ.get("HOT_SCORE_GRAVITY", "1.8"))
+HOT_RESCORE_INTERVAL = int(os.environ.get("HOT_RESCORE_INTERVAL", "300"))  # seconds
+HOT_RESCORE_WINDOW = int(os.environ.get("HOT_RESCORE_WINDOW", "7"))  # days
+
+# Full-text search configuration of PostgreSQL (ignored for SQLite FTS5)
+SEARCH_TS_CONFIG = os.environ.get("SEARCH_TS_CONFIG", "russian")
+
+# Posts events push: counters changes are coalesced within window (seconds),
+# subscriber is disconnected when it falls behind by more than EVENTS_QUEUE_SIZE batches
+EVENTS_COALESCE_WINDOW = float(os.environ.get("EVENTS_COALESCE_WINDOW", "0.25"))
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", "64"))
+
+# Admission control: requests are rejected with 503 when too many are in flight or pool wait is too long
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "200"))
+ADMISSION_MAX_POOL_WAIT = float(os.environ.get("ADMISSION_MAX_POOL_WAIT", "0.5"))  # seconds
+
+# Token bucket limits per user (or IP for guests): "METHOD /route" -> (tokens per second, burst)
+RATE_LIMITS = {
+    "POST /sign_in": (0.2, 5),
+    "POST /sign_up": (0.1, 3),
+    "PUT /posts/{post_id}/rate": (5.0, 20),
+    "PUT /posts/rates": (1.0, 5),
+}
+RATE_LIMIT_DEFAULT = (20.0, 40)
+# Networks of reverse proxies (nginx) whose X-Real-IP header is trusted, e.g. "172.16.0.0/12,127.0.0.1"
+TRUSTED_PROXIES = [ipaddress.ip_network(n) for n in os.environ.get("TRUSTED_PROXIES", "").split(",") if n]
+
+# Stateless HMAC-signed auth tokens. UUID tokens stored in DB are still accepted during migration.
+AUTH_TOKEN_SECRET = os.environ.get("AUTH_TOKEN_SECRET", "").encode()
+AUTH_SIGNED_TOKENS = os.environ.get("AUTH_SIGNED_TOKENS", "0") == "1"
+AUTH_TOKEN_TTL = int(os.environ.get("AUTH_TOKEN_TTL", str(7 * 24 * 3600)))  # seconds
+AUTH_DENYLIST_SYNC_INTERVAL = int(os.environ.get("AUTH_DENYLIST_SYNC_INTERVAL", "10"))  # seconds
+
+if AUTH_SIGNED_TOKENS and not AUTH_TOKEN_SECRET:
+    raise RuntimeError("AUTH_TOKEN_SECRET is required to issue signed auth tokens.")
+
+# Serve STORAGE_PATH files at /storage from backend (for deployments without nginx frontend)
+SERVE_STORAGE = os.environ.get("SERVE_STORAGE", "0") == "1"
+# Additional formats of uploaded images, chosen by Accept header when served from backend, e.g. "webp"
+STORAGE_IMAGE_VARIANTS = [f for f in os.environ.get("STORAGE_IMAGE_VARIANTS", "").split(",") if f]
+
+# Request processing time budgets, seconds: "METHOD /route" -> budget
+ROUTE_DEADLINES = {
+    "POST /posts": 30.0,
+    "POST /posts/batch": 120.0,
+    "POST /sign_in": 5.0,
+    "POST /sign_up": 5.0,
+}
+DEFAULT_DEADLINE = float(os.environ.get("DEFAULT_DEADLINE", "10"))
+
+# Sampling profiler of live requests: fraction of profiled requests, admins may force it with header
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER = "X-Profile-Request"
+PROFILES_PATH = Path(os.environ.get("PROFILES_PATH", "/tmp/profiles"))
+PROFILES_MAX_QUANTITY = int(os.environ.get("PROFILES_MAX_QUANTITY", "200"))
+
+# Maximum items quantity in batch requests
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "100"))
+
+# In-process index of rated posts of active users: at most RATED_INDEX_MAX_USERS users
+# with at most RATED_INDEX_MAX_POSTS rates each, entries live RATED_INDEX_TTL seconds
+RATED_INDEX_MAX_USERS = int(os.environ.get("RATED_INDEX_MAX_USERS", "10000"))
+RATED_INDEX_MAX_POSTS = int(os.environ.get("RATED_INDEX_MAX_POSTS", "2000"))
+RATED_INDEX_TTL = float(os.environ.get("RATED_INDEX_TTL", "60"))
@@ -2,7 +2,7 @@ from aiohttp import web
 from pydantic import BaseModel
 
 from src.entities import Role
-from src.services.auth import AuthService, KnownLoginError, BadLoginCredentialsError
+from src.services.auth import AuthService, KnownLoginError, BadLoginCredentialsError, UnknownTokenError
 from src.services.users import UsersService
 from src.utils import require, PydanticForm, Auth
 
@@ -37,6 +37,11 @@ async def sign_in_handler(request: web.Request, payload: SignInCredentials) -> w
 @router.post("/sign_out")
 @require(Auth(Role.ADMIN, Role.USER))
 async def sign_out_handler(request: web.Request) -> web.Response:
+    try:
+        await AuthService().logout(request.cookies["X-Auth-Token"])
+    except UnknownTokenError:
+        raise web.HTTPUnauthorized()
+
     response = web.HTTPOk()
     response.del_cookie("X-Auth-Token")
     return response
@@ -0,0 +1,22 @@
+from aiohttp import web
+
+from src.entities import Role
+from src.middlewares.deadline import timeouts_counter
+from src.utils import require, Auth
+
+router = web.RouteTableDef()
+
+
+@router.get('/metrics')
+@require(
+    Auth(Role.ADMIN),
+)
+async def get_metrics(_) -> web.Response:
+    lines = [
+        '# HELP request_deadline_timeouts_total Requests cancelled because route time budget was exceeded.',
+        '# TYPE request_deadline_timeouts_total counter',
+    ]
+    for route, quantity in sorted(timeouts_counter.items()):
+        lines.append(f'request_deadline_timeouts_total{{route="{route}"}} {quantity}')
+
+    return web.Response(text='\n'.join(lines) + '\n', content_type='text/plain')
@@ -1,14 +1,27 @@
+import asyncio
 import math
 from dataclasses import dataclass
 
+import PIL
 from PIL.Image import Image
-from aiohttp import web
-from pydantic import BaseModel, Field
+from aiohttp import web, WSCloseCode
+from pydantic import BaseModel, ConfigDict, Field
 
+from src import config
 from src.entities import Role, RateKind, Post
+from src.event_hub import event_hub
+from src.middlewares.admission import take_user_tokens
+from src.middlewares.db_transaction import release_db_conn
 from src.services.auth import AuthResult
-from src.services.posts import PostsService, BadPostImageError, UnknownPostError, PostsSorter
-from src.utils import require, Auth, PydanticQuery, FormField, PydanticJSON
+from src.services.posts import (
+    PostsService,
+    BadPostImageError,
+    UnknownPostError,
+    PostsSorter,
+    SearchCursor,
+    BadSearchCursorError,
+)
+from src.utils import require, Auth, PydanticQuery, FormField, PydanticJSON, long_living
 
 router = web.RouteTableDef()
 
@@ -23,10 +36,6 @@ class PaginatedList:
     items: list
     total_quantity: int
 
-@dataclass
-class RatedPost(Post):
-    rate: RateKind | None
-
 @router.get('/posts')
 @require(
     auth=Auth(Role.USER, Role.ADMIN),
@@ -43,28 +52,95 @@ async def get_posts(_, query: GetPostsListRequest, auth: AuthResult) -> web.Resp
         user_id=auth.user_id,
         *(p.id for p in posts)
     )
-    rated_posts = [
-        RatedPost(
-            id=post.id,
-            created_at=post.created_at,
-            text=post.text,
-            image_url=post.image_url,
-            likes_quantity=post.likes_quantity,
-            dislikes_quantity=post.dislikes_quantity,
-            rate=user_rates.get(post.id),
-        )
-        for post in posts
-    ]
+    for post in posts:
+        post.rate = user_rates.get(post.id)
     total_quantity = await service.get_total_quantity()
 
     return web.json_response(
         PaginatedList(
-            items=rated_posts,
+            items=posts,
             total_quantity=total_quantity,
         )
     )
 
 
+class SearchPostsRequest(BaseModel):
+    # Blank query has no terms to search by
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    query: str = Field(min_length=1, max_length=256)
+    per_page: int = Field(gt=0, le=100, default=5)
+    cursor: str | None = None
+
+@dataclass
+class CursorList:
+    items: list
+    next_cursor: str | None
+
+@router.get('/posts/search')
+@require(
+    auth=Auth(Role.USER, Role.ADMIN),
+    query=PydanticQuery(SearchPostsRequest),
+)
+async def search_posts(_, query: SearchPostsRequest, auth: AuthResult) -> web.Response:
+    try:
+        after = SearchCursor.decode(query.cursor) if query.cursor is not None else None
+    except BadSearchCursorError:
+        raise web.HTTPBadRequest(text='Неверный курсор поиска.')
+
+    found = await PostsService().search(
+        query=query.query,
+        limit=query.per_page,
+        user_id=auth.user_id,
+        after=after,
+    )
+    next_cursor = None
+    if len(found) == query.per_page:
+        next_cursor = SearchCursor(found[-1].rank, found[-1].post.id).encode()
+
+    return web.json_response(
+        CursorList(
+            items=[f.post for f in found],
+            next_cursor=next_cursor,
+        )
+    )
+
+
+@router.get('/posts/events')
+@long_living
+@require(
+    Auth(Role.USER, Role.ADMIN),
+)
+async def posts_events(request: web.Request) -> web.WebSocketResponse:
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    # Don't hold pooled connection for whole subscription lifetime
+    await release_db_conn()
+
+    async def send_events():
+        async for message in subscription:
+            await ws.send_str(message)
+
+    async def wait_closed():
+        async for _ in ws:
+            pass
+
+    subscription = event_hub.subscribe()
+    tasks = [asyncio.create_task(send_events()), asyncio.create_task(wait_closed())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        event_hub.unsubscribe(subscription)
+        for task in tasks:
+            task.cancel()
+
+    if subscription.lagged:
+        await ws.close(code=WSCloseCode.TRY_AGAIN_LATER, message=b'Events consumer is too slow.')
+    else:
+        await ws.close()
+    return ws
+
+
 @router.post('/posts')
 @require(
     Auth(Role.ADMIN),
@@ -112,3 +188,116 @@ async def delete_post(request: web.Request) -> web.Response:
     except UnknownPostError:
         raise web.HTTPNotFound(text='Неизвестный идентификатор поста.')
     return web.HTTPOk()
+
+
+@dataclass
+class BatchItemResult:
+    post_id: int | None
+    error: str | None = None
+    post: Post | None = None
+
+@dataclass
+class BatchResult:
+    results: list[BatchItemResult]
+
+
+class PostRateChange(BaseModel):
+    post_id: int
+    rate: RateKind | None
+
+class SetPostsRatesRequest(BaseModel):
+    rates: list[PostRateChange] = Field(min_length=1, max_length=config.BATCH_MAX_SIZE)
+
+@router.put('/posts/rates')
+@require(
+    auth=Auth(Role.USER),
+    payload=PydanticJSON(SetPostsRatesRequest),
+)
+async def set_posts_rates(_, auth: AuthResult, payload: SetPostsRatesRequest) -> web.Response:
+    # Every change is limited like single rate request, otherwise batches would bypass its limit
+    take_user_tokens('PUT /posts/{post_id}/rate', auth.user_id, len(payload.rates))
+    known_ids = await PostsService().update_user_rates(
+        user_id=auth.user_id,
+        new_rates={change.post_id: change.rate for change in payload.rates},
+    )
+    return web.json_response(
+        BatchResult(
+            results=[
+                BatchItemResult(
+                    post_id=change.post_id,
+                    error=None if change.post_id in known_ids else 'Неизвестный идентификатор поста.',
+                )
+                for change in payload.rates
+            ]
+        )
+    )
+
+
+class DeletePostsRequest(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=config.BATCH_MAX_SIZE)
+
+@router.post('/posts/batch_delete')
+@require(
+    Auth(Role.ADMIN),
+    payload=PydanticJSON(DeletePostsRequest),
+)
+async def delete_posts(_, payload: DeletePostsRequest) -> web.Response:
+    deleted_ids = await PostsService().delete_posts(payload.ids)
+    return web.json_response(
+        BatchResult(
+            results=[
+                BatchItemResult(
+                    post_id=post_id,
+                    error=None if post_id in deleted_ids else 'Неизвестный идентификатор поста.',
+                )
+                for post_id in payload.ids
+            ]
+        )
+    )
+
+
+def open_image(file) -> Image | None:
+    """Fully decoded image from file, None if file isn't a valid image."""
+    if file is None:
+        return None
+    try:
+        image = PIL.Image.open(file)
+        # Only header is read on opening, truncated or corrupt data is found by decoding
+        image.load()
+    except OSError:
+        return None
+    return image
+
+
+@router.post('/posts/batch')
+@require(
+    Auth(Role.ADMIN),
+)
+async def create_posts(request: web.Request) -> web.Response:
+    if request.content_type != 'multipart/form-data':
+        raise web.HTTPBadRequest(text='Only multipart/form-data Content-Type accepted.')
+
+    form_data = await request.post()
+    texts, images = form_data.getall('text', []), form_data.getall('image', [])
+    if len(texts) != len(images) or not 0 < len(texts) <= config.BATCH_MAX_SIZE:
+        raise web.HTTPBadRequest(
+            text=f'Form-data must contain from 1 to {config.BATCH_MAX_SIZE} pairs of "text" and "image" fields.'
+        )
+
+    # Images are decoded in worker thread, bad ones are reported per item and the rest of batch is created
+    opened_images = await asyncio.get_running_loop().run_in_executor(
+        None, lambda: [open_image(getattr(image_field, 'file', None)) for image_field in images]
+    )
+    results: list[BatchItemResult | None] = []
+    valid_items = []
+    for text, image in zip(texts, opened_images):
+        if image is None:
+            results.append(BatchItemResult(post_id=None, error='Неверный формат изображения поста.'))
+            continue
+        results.append(None)
+        valid_items.append((str(text), image))
+
+    created = iter(await PostsService().create_posts(valid_items) if valid_items else [])
+    results = [result or BatchItemResult(post_id=(post := next(created)).id, post=post) for result in results]
+
+    return web.json_response(BatchResult(results=results))
@@ -0,0 +1,27 @@
+from aiohttp import web
+
+from src.entities import Role
+from src.profile_storage import ProfileStorage
+from src.utils import require, Auth
+
+router = web.RouteTableDef()
+
+
+@router.get('/profiles')
+@require(
+    Auth(Role.ADMIN),
+)
+async def get_profiles(_) -> web.Response:
+    return web.json_response(ProfileStorage.list())
+
+
+@router.get(r'/profiles/{file_name}')
+@require(
+    Auth(Role.ADMIN),
+)
+async def get_profile(request: web.Request) -> web.FileResponse:
+    path = ProfileStorage.path(request.match_info['file_name'])
+    if path is None:
+        raise web.HTTPNotFound(text='Неизвестный профиль.')
+
+    return web.FileResponse(path, headers={'Content-Disposition': f'attachment; filename="{path.name}"'})
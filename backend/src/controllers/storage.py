@@ -0,0 +1,42 @@
+from aiohttp import web
+
+from src import config
+from src.image_storage import variant_path
+from src.middlewares.db_transaction import without_db_transaction
+
+router = web.RouteTableDef()
+
+# File names are unique (uuid), so file under name never changes
+CACHE_HEADERS = {
+    "Cache-Control": "public, max-age=31536000, immutable",
+    "Vary": "Accept",
+}
+
+
+def accepted_types(accept: str) -> set[str]:
+    types = set()
+    for item in accept.split(","):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        if "q=0" in params or "q=0.0" in params:
+            continue
+        types.add(media_type.lower())
+    return types
+
+
+@router.get(r'/storage/{file_name:[\w\-]+\.\w+}')
+@without_db_transaction
+async def get_storage_file(request: web.Request) -> web.FileResponse:
+    path = config.STORAGE_PATH / request.match_info['file_name']
+
+    accepted = accepted_types(request.headers.get('Accept', ''))
+    for image_format in config.STORAGE_IMAGE_VARIANTS:
+        content_type = f'image/{image_format}'
+        variant = variant_path(path, image_format)
+        if content_type in accepted and variant.is_file():
+            return web.FileResponse(variant, headers={**CACHE_HEADERS, 'Content-Type': content_type})
+
+    if not path.is_file():
+        raise web.HTTPNotFound()
+
+    # FileResponse sends file with sendfile() and handles Range and If-Modified-Since itself
+    return web.FileResponse(path, headers=CACHE_HEADERS)
@@ -9,13 +9,13 @@ class Role(str, enum.Enum):
     USER = 'user'
 
 
-@dataclass
+@dataclass(slots=True)
 class AuthInfo:
     user_id: int
     user_role: Role
 
 
-@dataclass
+@dataclass(slots=True)
 class User:
     id: int
     first_name: str
@@ -23,20 +23,20 @@ class User:
     role: Role
 
 
-@dataclass
+@dataclass(slots=True)
 class UserCredentials:
     user_id: int
     login: str
     password_hash: bytes
 
 
-@dataclass
+@dataclass(slots=True)
 class UserToken:
     user_id: int
     token: str
 
 
-@dataclass
+@dataclass(slots=True)
 class Post:
     id: int
     created_at: Datetime
@@ -50,7 +50,13 @@ class RateKind(str, enum.Enum):
     LIKE = 'like'
     DISLIKE = 'dislike'
 
-@dataclass
+
+@dataclass(slots=True)
+class RatedPost(Post):
+    rate: RateKind | None = None
+
+
+@dataclass(slots=True)
 class PostRate:
     id: int
     post_id: int
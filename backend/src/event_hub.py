@@ -0,0 +1,145 @@
+import abc
+import asyncio
+import json
+import logging
+import typing
+
+from pydantic.json import pydantic_encoder
+
+from src import config
+from src.entities import Post
+
+_LOGGER = logging.getLogger("event_hub")
+
+Receiver = typing.Callable[[str], None]
+
+
+class Broker(abc.ABC):
+    """Delivers encoded events batches to every process subscribed to the hub."""
+
+    @abc.abstractmethod
+    async def publish(self, message: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def set_receiver(self, receiver: Receiver) -> None:
+        ...
+
+
+class LocalBroker(Broker):
+    """Broker for single process deployment: messages are delivered to the same process."""
+
+    def __init__(self):
+        self._receiver: Receiver | None = None
+
+    async def publish(self, message: str) -> None:
+        if self._receiver is not None:
+            self._receiver(message)
+
+    def set_receiver(self, receiver: Receiver) -> None:
+        self._receiver = receiver
+
+
+class Subscription:
+    def __init__(self, queue_size: int):
+        self._queue: asyncio.Queue[str | None] = asyncio.Queue(maxsize=queue_size)
+        self.lagged = False
+
+    def deliver(self, message: str) -> None:
+        if self.lagged:
+            return
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow consumer is dropped instead of buffering events without limit
+            self.lagged = True
+            self._queue.get_nowait()
+            self._queue.put_nowait(None)
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> str:
+        message = await self._queue.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+
+class EventHub:
+    """
+    Collects posts events, coalesces counters changes of each post within a short window
+    and fans out encoded batches to subscribers.
+    """
+
+    def __init__(self, broker: Broker, window: float, queue_size: int):
+        self._window = window
+        self._queue_size = queue_size
+        self._subscribers: set[Subscription] = set()
+
+        self._created: dict[int, Post] = {}
+        self._deleted: set[int] = set()
+        self._counters: dict[int, tuple[int, int]] = {}
+        self._has_pending = asyncio.Event()
+
+        self.set_broker(broker)
+
+    def set_broker(self, broker: Broker) -> None:
+        self._broker = broker
+        self._broker.set_receiver(self._dispatch)
+
+    def post_created(self, post: Post) -> None:
+        self._created[post.id] = post
+        self._has_pending.set()
+
+    def post_deleted(self, post_id: int) -> None:
+        self._created.pop(post_id, None)
+        self._counters.pop(post_id, None)
+        self._deleted.add(post_id)
+        self._has_pending.set()
+
+    def counters_changed(self, post_id: int, likes_quantity: int, dislikes_quantity: int) -> None:
+        self._counters[post_id] = (likes_quantity, dislikes_quantity)
+        self._has_pending.set()
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self._queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    async def run(self) -> None:
+        while True:
+            await self._has_pending.wait()
+            await asyncio.sleep(self._window)
+            try:
+                await self._broker.publish(self._take_batch())
+            except Exception:
+                _LOGGER.exception("Events batch publishing failed.")
+
+    def _take_batch(self) -> str:
+        batch = {
+            "created": list(self._created.values()),
+            "deleted": list(self._deleted),
+            "counters": [
+                {"post_id": post_id, "likes_quantity": likes, "dislikes_quantity": dislikes}
+                for post_id, (likes, dislikes) in self._counters.items()
+            ],
+        }
+        self._created, self._deleted, self._counters = {}, set(), {}
+        self._has_pending.clear()
+        # Encoded once for all subscribers
+        return json.dumps(batch, default=pydantic_encoder)
+
+    def _dispatch(self, message: str) -> None:
+        for subscription in self._subscribers:
+            subscription.deliver(message)
+
+
+event_hub = EventHub(
+    LocalBroker(),
+    window=config.EVENTS_COALESCE_WINDOW,
+    queue_size=config.EVENTS_QUEUE_SIZE,
+)
@@ -1,23 +1,80 @@
+import asyncio
+import contextlib
 import os
 import uuid
+from pathlib import Path
 
 from PIL.Image import Image
 
 from src import config
 
+URL_PREFIX = "/storage/"
+
+# References to running background deletions, so tasks aren't garbage collected
+_DELETIONS: set[asyncio.Task] = set()
+
+
+def variant_path(path: Path, image_format: str) -> Path:
+    return path.with_suffix(f".{image_format}")
+
+
+def url_to_path(image_url: str) -> Path:
+    return config.STORAGE_PATH / image_url.removeprefix(URL_PREFIX)
+
 
 class ImageStorage:
     @classmethod
     async def save(cls, image: Image) -> str:
-        if image.mode == "RGBA":
+        return cls._save(image)
+
+    @classmethod
+    async def save_many(cls, images: list[Image]) -> list[str]:
+        """Save batch of images in one worker thread without blocking event loop, nothing is kept on failure."""
+
+        def save_all():
+            images_urls = []
+            try:
+                for image in images:
+                    images_urls.append(cls._save(image))
+            except BaseException:
+                cls._delete_files(images_urls)
+                raise
+            return images_urls
+
+        return await asyncio.get_running_loop().run_in_executor(None, save_all)
+
+    @classmethod
+    async def delete_many(cls, images_urls: list[str]) -> None:
+        """Delete batch of images by their URLs in one worker thread, missing files are skipped."""
+
+        await asyncio.get_running_loop().run_in_executor(None, lambda: cls._delete_files(images_urls))
+
+    @classmethod
+    def delete_many_in_background(cls, images_urls: list[str]) -> None:
+        task = asyncio.create_task(cls.delete_many(images_urls))
+        _DELETIONS.add(task)
+        task.add_done_callback(_DELETIONS.discard)
+
+    @staticmethod
+    def _delete_files(images_urls: list[str]) -> None:
+        for image_url in images_urls:
+            path = url_to_path(image_url)
+            for p in [path, *(variant_path(path, f) for f in config.STORAGE_IMAGE_VARIANTS)]:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(p)
+
+    @staticmethod
+    def _save(image: Image) -> str:
+        # JPEG supports neither alpha channel nor palette
+        if image.mode not in ("RGB", "L"):
             image = image.convert("RGB")
 
         file_name = f"{uuid.uuid4()}.jpeg"
         path = config.STORAGE_PATH / file_name
 
         image.save(path, format="jpeg")
-        return f"/storage/{file_name}"
+        # Pre-generated variants are picked by Accept header on serving
+        for image_format in config.STORAGE_IMAGE_VARIANTS:
+            image.save(variant_path(path, image_format), format=image_format)
 
-    @staticmethod
-    async def delete_image(image_path: str) -> None:
-        os.remove(image_path)
+        return f"{URL_PREFIX}{file_name}"
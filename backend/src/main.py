@@ -1,28 +1,76 @@
+import asyncio
+import contextlib
 import functools
 import json
+import logging
+import math
 
 from aiohttp import web
 from aiohttp_middlewares import cors_middleware
 from pydantic.json import pydantic_encoder
-from sqlalchemy.ext.asyncio import create_async_engine
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
 
 from src import config
 from src.controllers.auth import router as auth_router
+from src.controllers.metrics import router as metrics_router
 from src.controllers.posts import router as posts_router
+from src.controllers.profiles import router as profiles_router
+from src.controllers.storage import router as storage_router
+from src.event_hub import event_hub
 from src.tables import create_schema
+from src.middlewares.admission import admission_middleware, guest_rate_limit_middleware, rate_limit_middleware
 from src.middlewares.auth import auth_middleware
-from src.middlewares.db_transaction import request_transaction_middleware
+from src.middlewares.deadline import deadline_middleware
+from src.middlewares.profiling import profiling_middleware
+from src.middlewares.db_transaction import request_transaction_middleware, db_transaction
+from src.services.auth import AuthService
+from src.services.posts import PostsService
 
 
-async def init_database(app: web.Application) -> None:
+def create_db_engine(echo: bool = True) -> AsyncEngine:
     db_url = config.DB_URL.replace("postgresql:/", "postgresql+asyncpg:/").replace("sqlite:/", "sqlite+aiosqlite:/")
-    engine = create_async_engine(db_url, echo=True)
+    engine = create_async_engine(db_url, echo=echo)
+    if engine.dialect.name == "sqlite":
+        # Hot score is computed in SQL, and power() is missing in SQLite builds without math functions
+        sa.event.listen(
+            engine.sync_engine,
+            "connect",
+            lambda dbapi_conn, _: dbapi_conn.create_function("power", 2, math.pow, deterministic=True),
+        )
+    return engine
+
+
+async def init_database(app: web.Application) -> None:
+    engine = create_db_engine()
     await create_schema(engine)
     app["db_engine"] = engine
     yield
     await engine.dispose()
 
 
+_HOT_LOGGER = logging.getLogger("hot_rescorer")
+
+
+async def rescore_hot_posts_periodically(engine) -> None:
+    while True:
+        try:
+            async with db_transaction(engine):
+                rescored = await PostsService().rescore_hot()
+            _HOT_LOGGER.info(f"Hot score of {rescored} posts recalculated.")
+        except Exception:
+            _HOT_LOGGER.exception("Hot score recalculation failed.")
+        await asyncio.sleep(config.HOT_RESCORE_INTERVAL)
+
+
+async def init_hot_rescorer(app: web.Application) -> None:
+    task = asyncio.create_task(rescore_hot_posts_periodically(app["db_engine"]))
+    yield
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
 # Setup json serializer for responses
 web.json_response = functools.partial(
     web.json_response,
@@ -33,19 +81,66 @@ web.json_response = functools.partial(
 )
 
 
+_AUTH_LOGGER = logging.getLogger("auth")
+
+
+async def sync_token_denylist(engine) -> None:
+    async with db_transaction(engine):
+        await AuthService().sync_denylist()
+
+
+async def sync_token_denylist_periodically(engine) -> None:
+    while True:
+        await asyncio.sleep(config.AUTH_DENYLIST_SYNC_INTERVAL)
+        try:
+            await sync_token_denylist(engine)
+        except Exception:
+            _AUTH_LOGGER.exception("Tokens denylist synchronization failed.")
+
+
+async def init_token_denylist(app: web.Application) -> None:
+    # Revoked tokens must not be accepted by requests served before first synchronization
+    await sync_token_denylist(app["db_engine"])
+    task = asyncio.create_task(sync_token_denylist_periodically(app["db_engine"]))
+    yield
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+async def init_event_hub(app: web.Application) -> None:
+    task = asyncio.create_task(event_hub.run())
+    yield
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
 def init() -> web.Application:
     app = web.Application(
         middlewares=[
             cors_middleware(allow_all=True, allow_credentials=True),
+            guest_rate_limit_middleware,
+            admission_middleware,
+            deadline_middleware,
             request_transaction_middleware,
             auth_middleware,
+            profiling_middleware,
+            rate_limit_middleware,
         ],
         client_max_size=1024**2 * 20,  # 20MB
     )
     app.cleanup_ctx.append(init_database)
+    app.cleanup_ctx.append(init_hot_rescorer)
+    app.cleanup_ctx.append(init_event_hub)
+    app.cleanup_ctx.append(init_token_denylist)
 
     app.add_routes(auth_router)
     app.add_routes(posts_router)
+    app.add_routes(metrics_router)
+    app.add_routes(profiles_router)
+    if config.SERVE_STORAGE:
+        app.add_routes(storage_router)
 
     return app
 
@@ -54,4 +149,5 @@ if __name__ == "__main__":
     import logging
 
     logging.basicConfig(level=logging.INFO)
-    web.run_app(init(), port=8080)
+    # Handlers of disconnected clients are cancelled, so their transactions are rolled back
+    web.run_app(init(), port=8080, handler_cancellation=True)
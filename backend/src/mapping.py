@@ -0,0 +1,93 @@
+import dataclasses
+import enum
+import operator
+import typing
+
+from sqlalchemy.engine import Result
+
+T = typing.TypeVar("T")
+E = typing.TypeVar("E", bound=enum.Enum)
+
+
+def enum_converter(enum_type: typing.Type[E]) -> typing.Callable[[typing.Any], E | None]:
+    """
+    Database value to enum member conversion with cache.
+    Value may be member itself or its name/value in any case (depends on driver).
+    """
+    cache: dict[typing.Any, E | None] = {None: None}
+
+    def convert(value: typing.Any) -> E | None:
+        try:
+            return cache[value]
+        except KeyError:
+            member = value if isinstance(value, enum_type) else enum_type(value.lower())
+            cache[value] = member
+            return member
+
+    return convert
+
+
+class RowMapper(typing.Generic[T]):
+    """
+    Builds dataclass entities from result rows positionally.
+    Column indexes are resolved once per result columns set, so there are no lookups by name for each row.
+    Entity fields absent in result are left with their defaults, they must follow all present fields.
+    """
+
+    def __init__(
+        self,
+        entity: typing.Type[T],
+        columns: dict[str, str] | None = None,
+        converters: dict[str, typing.Callable[[typing.Any], typing.Any]] | None = None,
+    ):
+        self._entity = entity
+        self._fields = [f.name for f in dataclasses.fields(entity)]
+        self._columns = columns or {}
+        self._converters = converters or {}
+        self._getters: dict[tuple[str, ...], typing.Callable[[typing.Any], typing.Any]] = {}
+
+    def all(self, result: Result) -> list[T]:
+        return self.map(result.keys(), result.all())
+
+    def map(self, keys: typing.Iterable[str], rows: typing.Iterable[typing.Any]) -> list[T]:
+        build = self._builder(tuple(keys))
+        return [build(row) for row in rows]
+
+    def _builder(self, keys: tuple[str, ...]) -> typing.Callable[[typing.Any], T]:
+        build = self._getters.get(keys)
+        if build is None:
+            build = self._getters[keys] = self._make_builder(keys)
+        return build
+
+    def _make_builder(self, keys: tuple[str, ...]) -> typing.Callable[[typing.Any], T]:
+        indexes, converters = [], []
+        for field in self._fields:
+            column = self._columns.get(field, field)
+            if column not in keys:
+                break
+            indexes.append(keys.index(column))
+            converters.append(self._converters.get(field))
+
+        if not indexes:
+            raise ValueError(f"Result has no columns of {self._entity.__name__}.")
+
+        missing = [f for f in self._fields[len(indexes):] if self._columns.get(f, f) in keys]
+        if missing:
+            raise ValueError(f"Fields {missing} of {self._entity.__name__} can't be mapped positionally.")
+
+        entity = self._entity
+        # itemgetter of single index returns value instead of tuple
+        get = operator.itemgetter(*indexes) if len(indexes) > 1 else (lambda row, i=indexes[0]: (row[i],))
+
+        if not any(converters):
+            return lambda row: entity(*get(row))
+
+        converted = [(i, convert) for i, convert in enumerate(converters) if convert is not None]
+
+        def build(row) -> T:
+            values = list(get(row))
+            for i, convert in converted:
+                values[i] = convert(values[i])
+            return entity(*values)
+
+        return build
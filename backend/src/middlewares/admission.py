@@ -0,0 +1,131 @@
+import ipaddress
+import math
+import time
+
+from aiohttp import web
+
+from src import config
+from src.middlewares.auth import AUTH_COOKIE
+from src.middlewares.db_transaction import pool_wait_monitor, uses_db_transaction
+from src.services.auth import AuthResult
+from src.utils import route_name, is_long_living
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def take(self, tokens: int = 1) -> float:
+        """Take tokens. Returns 0 on success, otherwise seconds until tokens are available."""
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+        # More tokens than capacity are taken from full bucket, later requests wait until the debt is repaid
+        required = min(tokens, self._capacity)
+        if self._tokens >= required:
+            self._tokens -= tokens
+            return 0.0
+        return (required - self._tokens) / self._rate
+
+    @property
+    def is_idle(self) -> bool:
+        return self._tokens + (time.monotonic() - self._updated_at) * self._rate >= self._capacity
+
+
+class RateLimiter:
+    def __init__(self, limits: dict[str, tuple[float, float]], default: tuple[float, float], max_buckets: int):
+        self._limits = limits
+        self._default = default
+        self._max_buckets = max_buckets
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+
+    def take(self, route: str, client: str, tokens: int = 1) -> float:
+        key = (route, client)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self._max_buckets:
+                self._evict_idle()
+            bucket = self._buckets[key] = TokenBucket(*self._limits.get(route, self._default))
+        return bucket.take(tokens)
+
+    def _evict_idle(self) -> None:
+        # Full bucket is equivalent to absent one
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if not bucket.is_idle}
+
+
+_RATE_LIMITER = RateLimiter(config.RATE_LIMITS, config.RATE_LIMIT_DEFAULT, max_buckets=100_000)
+_IN_FLIGHT = 0
+
+
+def _retry_after(seconds: float) -> dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+@web.middleware
+async def admission_middleware(request: web.Request, handler) -> web.StreamResponse:
+    """Shed load before request takes pooled connection, so latency of admitted requests stays bounded."""
+    global _IN_FLIGHT
+
+    # Long-living events subscriptions are not counted
+    if is_long_living(request):
+        return await handler(request)
+
+    if _IN_FLIGHT >= config.ADMISSION_MAX_IN_FLIGHT or pool_wait_monitor.average > config.ADMISSION_MAX_POOL_WAIT:
+        raise web.HTTPServiceUnavailable(text="Сервер перегружен, повторите запрос позже.", headers=_retry_after(1))
+
+    _IN_FLIGHT += 1
+    try:
+        return await handler(request)
+    finally:
+        _IN_FLIGHT -= 1
+
+
+def client_ip(request: web.Request) -> str:
+    try:
+        is_trusted = any(ipaddress.ip_address(request.remote) in n for n in config.TRUSTED_PROXIES)
+    except ValueError:
+        is_trusted = False
+    # Otherwise header is set by client itself
+    return request.headers.get("X-Real-IP", request.remote) if is_trusted else request.remote
+
+
+def _take_token(request: web.Request, client: str) -> None:
+    _take_tokens(route_name(request), client, 1)
+
+
+def take_user_tokens(route: str, user_id: int, tokens: int) -> None:
+    """Charge user's limit of another route, e.g. batch request is charged per item from single item route."""
+    _take_tokens(route, f"user:{user_id}", tokens)
+
+
+def _take_tokens(route: str, client: str, tokens: int) -> None:
+    retry_after = _RATE_LIMITER.take(route, client, tokens)
+    if retry_after > 0:
+        raise web.HTTPTooManyRequests(text="Слишком много запросов, повторите позже.", headers=_retry_after(retry_after))
+
+
+@web.middleware
+async def guest_rate_limit_middleware(request: web.Request, handler) -> web.StreamResponse:
+    """Limit guests per IP before request takes pooled connection."""
+    # Handlers without database (static files) are cheap, limits are for expensive ones.
+    # Requests with auth token are limited after authorization by rate_limit_middleware
+    if uses_db_transaction(request) and AUTH_COOKIE not in request.cookies:
+        _take_token(request, f"ip:{client_ip(request)}")
+
+    return await handler(request)
+
+
+@web.middleware
+async def rate_limit_middleware(request: web.Request, handler) -> web.StreamResponse:
+    if not uses_db_transaction(request) or AUTH_COOKIE not in request.cookies:
+        return await handler(request)
+
+    auth: AuthResult = request["auth"]
+    # Invalid or expired token doesn't give its own limits
+    _take_token(request, f"user:{auth.user_id}" if auth.is_authorized else f"ip:{client_ip(request)}")
+
+    return await handler(request)
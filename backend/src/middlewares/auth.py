@@ -1,12 +1,15 @@
 from aiohttp import web
 
+from src.middlewares.db_transaction import uses_db_transaction
 from src.services.auth import AuthResult, AuthService
 
+AUTH_COOKIE = "X-Auth-Token"
+
 
 @web.middleware
 async def auth_middleware(request: web.Request, handler) -> web.StreamResponse:
-    token = request.cookies.get("X-Auth-Token")
-    if token is None:
+    token = request.cookies.get(AUTH_COOKIE)
+    if token is None or not uses_db_transaction(request):
         auth = AuthResult(is_authorized=False)
     else:
         auth = await AuthService().authorize(token)
@@ -1,33 +1,140 @@
+import asyncio
+import contextlib
 import contextvars
+import time
+import typing
 
 from aiohttp import web
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
 
 _DB_CONN: contextvars.ContextVar[AsyncConnection] = contextvars.ContextVar("db_conn")
+_DEADLINE: contextvars.ContextVar[float | None] = contextvars.ContextVar("deadline", default=None)
+_AFTER_COMMIT: contextvars.ContextVar[list[typing.Callable[[], None]]] = contextvars.ContextVar("after_commit")
+_AFTER_ROLLBACK: contextvars.ContextVar[list[typing.Callable[[], None]]] = contextvars.ContextVar("after_rollback")
 
 
 def get_db_conn() -> AsyncConnection:
     return _DB_CONN.get()
 
 
-@web.middleware
-async def request_transaction_middleware(request: web.Request, handler) -> web.StreamResponse:
-    engine: AsyncEngine = request.app["db_engine"]
+class PoolWaitMonitor:
+    """Exponentially weighted moving average of time spent waiting for pooled connection."""
+
+    def __init__(self, alpha: float = 0.2, max_age: float = 1.0):
+        self._alpha = alpha
+        self._max_age = max_age
+        self._average = 0.0
+        self._updated_at = 0.0
+
+    def observe(self, wait: float) -> None:
+        self._average += self._alpha * (wait - self._average)
+        self._updated_at = time.monotonic()
+
+    @property
+    def average(self) -> float:
+        # Stale average is ignored, otherwise pool wouldn't be measured again after load shedding started
+        if time.monotonic() - self._updated_at > self._max_age:
+            return 0.0
+        return self._average
+
+
+pool_wait_monitor = PoolWaitMonitor()
+
+
+def without_db_transaction(handler):
+    """Mark handler which doesn't use database, so no pooled connection is taken for its requests."""
+    handler.without_db_transaction = True
+    return handler
+
+
+def uses_db_transaction(request: web.Request) -> bool:
+    return not getattr(request.match_info.handler, "without_db_transaction", False)
+
+
+def set_transaction_deadline(deadline: float) -> None:
+    """Set event loop time by which transactions opened in current context must be finished."""
+    _DEADLINE.set(deadline)
+
+
+async def _set_statement_timeout(conn: AsyncConnection) -> None:
+    deadline = _DEADLINE.get()
+    # SQLite has no server-side statement timeout
+    if deadline is None or conn.dialect.name != "postgresql":
+        return
+
+    timeout_ms = max(int((deadline - asyncio.get_running_loop().time()) * 1000), 1)
+    await conn.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
 
+
+def call_after_commit(callback: typing.Callable[[], None]) -> None:
+    """Schedule callback to be called if current transaction is committed successfully."""
+    _AFTER_COMMIT.get().append(callback)
+
+
+def call_after_rollback(callback: typing.Callable[[], None]) -> None:
+    """Schedule callback to be called if current transaction is rolled back or fails to commit."""
+    _AFTER_ROLLBACK.get().append(callback)
+
+
+async def release_db_conn() -> None:
+    """Commit current transaction and return connection to pool before long-running work (e.g. streaming)."""
+    conn = get_db_conn()
+    if conn.closed:
+        return
+    await conn.commit()
+    await conn.close()
+    _AFTER_ROLLBACK.get().clear()
+    _run_callbacks(_AFTER_COMMIT)
+
+
+def _run_callbacks(callbacks_var: contextvars.ContextVar[list[typing.Callable[[], None]]]) -> None:
+    callbacks = callbacks_var.get()
+    while callbacks:
+        callbacks.pop(0)()
+
+
+@contextlib.asynccontextmanager
+async def db_transaction(engine: AsyncEngine) -> typing.AsyncIterator[AsyncConnection]:
+    """Open connection bound to current context, commit on success and rollback on error."""
     conn = engine.connect()
+    started = time.perf_counter()
     await conn.start()
+    pool_wait_monitor.observe(time.perf_counter() - started)
 
-    _DB_CONN.set(conn)
+    conn_token = _DB_CONN.set(conn)
+    after_commit_token = _AFTER_COMMIT.set([])
+    after_rollback_token = _AFTER_ROLLBACK.set([])
 
     try:
         try:
-            response = await handler(request)
-        except Exception:
-            await conn.rollback()
+            # Database stops working on request too when its deadline passes
+            await _set_statement_timeout(conn)
+            yield conn
+            if not conn.closed:
+                await conn.commit()
+        except BaseException:
+            try:
+                if not conn.closed:
+                    await conn.rollback()
+            finally:
+                _run_callbacks(_AFTER_ROLLBACK)
             raise
         else:
-            await conn.commit()
-
-        return response
+            _run_callbacks(_AFTER_COMMIT)
     finally:
+        _AFTER_ROLLBACK.reset(after_rollback_token)
+        _AFTER_COMMIT.reset(after_commit_token)
+        _DB_CONN.reset(conn_token)
         await conn.close()
+
+
+@web.middleware
+async def request_transaction_middleware(request: web.Request, handler) -> web.StreamResponse:
+    if not uses_db_transaction(request):
+        return await handler(request)
+
+    engine: AsyncEngine = request.app["db_engine"]
+
+    async with db_transaction(engine):
+        return await handler(request)
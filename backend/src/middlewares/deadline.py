@@ -0,0 +1,28 @@
+import asyncio
+import collections
+
+from aiohttp import web
+
+from src import config
+from src.middlewares.db_transaction import set_transaction_deadline
+from src.utils import route_name, is_long_living
+
+timeouts_counter: collections.Counter[str] = collections.Counter()
+
+
+@web.middleware
+async def deadline_middleware(request: web.Request, handler) -> web.StreamResponse:
+    # Long-living events subscriptions have no deadline
+    if is_long_living(request):
+        return await handler(request)
+
+    route = route_name(request)
+    budget = config.ROUTE_DEADLINES.get(route, config.DEFAULT_DEADLINE)
+    set_transaction_deadline(asyncio.get_running_loop().time() + budget)
+
+    try:
+        # Handler is cancelled on timeout, so transaction is rolled back and connection returned to pool
+        return await asyncio.wait_for(handler(request), budget)
+    except asyncio.TimeoutError:
+        timeouts_counter[route] += 1
+        raise web.HTTPGatewayTimeout(text="Превышено время обработки запроса.")
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import random
+import time
+
+from aiohttp import web
+from pyinstrument import Profiler
+
+from src import config
+from src.entities import Role
+from src.profile_storage import ProfileStorage
+from src.services.auth import AuthResult
+from src.utils import route_name, is_long_living
+
+_LOGGER = logging.getLogger("profiling")
+
+
+def _should_profile(request: web.Request) -> bool:
+    # Profile of events subscription would cover its whole lifetime
+    if is_long_living(request):
+        return False
+    if config.PROFILE_HEADER in request.headers:
+        auth: AuthResult = request["auth"]
+        return auth.role == Role.ADMIN
+    return config.PROFILE_SAMPLE_RATE > 0 and random.random() < config.PROFILE_SAMPLE_RATE
+
+
+@web.middleware
+async def profiling_middleware(request: web.Request, handler) -> web.StreamResponse:
+    if not _should_profile(request):
+        return await handler(request)
+
+    # Statistical profiler, in async mode only time of this request's task is attributed
+    profiler = Profiler(async_mode="enabled")
+    started = time.perf_counter()
+    profiler.start()
+    try:
+        return await handler(request)
+    finally:
+        profiler.stop()
+        duration = time.perf_counter() - started
+        route = route_name(request)
+        try:
+            file_name = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: ProfileStorage.save(profiler.output_html(), route, duration)
+            )
+            _LOGGER.info(f"Request {route} profiled to {file_name}.")
+        except Exception:
+            _LOGGER.exception("Request profile saving failed.")
@@ -0,0 +1,56 @@
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime as Datetime
+from pathlib import Path
+
+from src import config
+
+PROFILE_NAME_PATTERN = r"[\w\-]+\.html"
+
+
+@dataclass(slots=True)
+class ProfileInfo:
+    name: str
+    size: int
+    created_at: Datetime
+
+
+class ProfileStorage:
+    """Rotating directory of per-request profiles, the oldest are removed first."""
+
+    @classmethod
+    def save(cls, html: str, route: str, duration: float) -> str:
+        config.PROFILES_PATH.mkdir(parents=True, exist_ok=True)
+
+        # Name starts with timestamp, so names order is creation order
+        route_tag = re.sub(r"[^\w]+", "-", route).strip("-")
+        file_name = f"{time.time_ns()}_{route_tag}_{int(duration * 1000)}ms.html"
+        (config.PROFILES_PATH / file_name).write_text(html)
+
+        cls._rotate()
+        return file_name
+
+    @classmethod
+    def list(cls) -> list[ProfileInfo]:
+        if not config.PROFILES_PATH.is_dir():
+            return []
+
+        profiles = []
+        for path in sorted(config.PROFILES_PATH.glob("*.html"), reverse=True):
+            stat = path.stat()
+            profiles.append(ProfileInfo(path.name, stat.st_size, Datetime.fromtimestamp(stat.st_mtime)))
+        return profiles
+
+    @staticmethod
+    def path(file_name: str) -> Path | None:
+        if re.fullmatch(PROFILE_NAME_PATTERN, file_name) is None:
+            return None
+        path = config.PROFILES_PATH / file_name
+        return path if path.is_file() else None
+
+    @staticmethod
+    def _rotate() -> None:
+        paths = sorted(config.PROFILES_PATH.glob("*.html"))
+        for path in paths[: max(len(paths) - config.PROFILES_MAX_QUANTITY, 0)]:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,125 @@
+import array
+import bisect
+import collections
+import time
+import typing
+
+from src import config
+
+
+class RatedPostsIndex:
+    """
+    In-process index of posts rated by recently active users: user id -> sorted array of posts ids.
+    Least recently used users are evicted, users with too many rates are only marked as not indexable.
+    Entries expire after ttl, so changes made by other processes are seen eventually.
+    """
+
+    def __init__(self, max_users: int, max_posts: int, ttl: float):
+        self._max_users = max_users
+        self._max_posts = max_posts
+        self._ttl = ttl
+        # None posts ids mark user with too many rates
+        self._entries: collections.OrderedDict[int, tuple[float, array.array | None]] = collections.OrderedDict()
+        # Users being loaded now -> [loads in progress, changes counter], counter tells loads about changes
+        # made after they had started, even when other loads of the same user start and finish meanwhile
+        self._loading: dict[int, list[int]] = {}
+
+    @property
+    def max_posts(self) -> int:
+        return self._max_posts
+
+    def get(self, user_id: int) -> array.array | None:
+        """Sorted ids of posts rated by user, None if user isn't indexed."""
+        entry = self._get_entry(user_id)
+        return entry[1] if entry is not None else None
+
+    def is_indexable(self, user_id: int) -> bool:
+        """False if user is known to have too many rates, so their posts ids aren't worth loading."""
+        entry = self._get_entry(user_id)
+        return entry is None or entry[1] is not None
+
+    def _get_entry(self, user_id: int) -> tuple[float, array.array | None] | None:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+
+        if time.monotonic() - entry[0] > self._ttl:
+            del self._entries[user_id]
+            return None
+
+        self._entries.move_to_end(user_id)
+        return entry
+
+    def begin_load(self, user_id: int) -> int:
+        """Returns load ticket to pass to finish_load."""
+        loading = self._loading.setdefault(user_id, [0, 0])
+        loading[0] += 1
+        return loading[1]
+
+    def finish_load(self, user_id: int, ticket: int, posts_ids: array.array | None) -> None:
+        """Store sorted posts ids loaded for user, None means loading failed."""
+        loading = self._loading[user_id]
+        loading[0] -= 1
+        if not loading[0]:
+            del self._loading[user_id]
+
+        if posts_ids is None:
+            return
+        if len(posts_ids) > self._max_posts:
+            self._store(user_id, None)
+            return
+        # Loaded rates may miss changes committed during loading
+        if loading[1] == ticket:
+            self._store(user_id, posts_ids)
+
+    def _store(self, user_id: int, posts_ids: array.array | None) -> None:
+        self._entries[user_id] = (time.monotonic(), posts_ids)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self._max_users:
+            self._entries.popitem(last=False)
+
+    def add(self, user_id: int, post_id: int) -> None:
+        self._mark_changed(user_id)
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] is None:
+            return
+
+        posts_ids = entry[1]
+        i = bisect.bisect_left(posts_ids, post_id)
+        if i < len(posts_ids) and posts_ids[i] == post_id:
+            return
+        if len(posts_ids) >= self._max_posts:
+            self._entries[user_id] = (entry[0], None)
+            return
+        posts_ids.insert(i, post_id)
+
+    def discard(self, user_id: int, post_id: int) -> None:
+        self._mark_changed(user_id)
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] is None:
+            return
+
+        posts_ids = entry[1]
+        i = bisect.bisect_left(posts_ids, post_id)
+        if i < len(posts_ids) and posts_ids[i] == post_id:
+            del posts_ids[i]
+
+    def _mark_changed(self, user_id: int) -> None:
+        if user_id in self._loading:
+            self._loading[user_id][1] += 1
+
+
+def intersect(posts_ids: typing.Iterable[int], rated_ids: array.array) -> list[int]:
+    result = []
+    for post_id in posts_ids:
+        i = bisect.bisect_left(rated_ids, post_id)
+        if i < len(rated_ids) and rated_ids[i] == post_id:
+            result.append(post_id)
+    return result
+
+
+rated_posts_index = RatedPostsIndex(
+    max_users=config.RATED_INDEX_MAX_USERS,
+    max_posts=config.RATED_INDEX_MAX_POSTS,
+    ttl=config.RATED_INDEX_TTL,
+)
@@ -1,4 +1,8 @@
+import base64
+import binascii
 import hashlib
+import hmac
+import time
 import uuid
 from dataclasses import dataclass
 
@@ -7,8 +11,11 @@ from sqlalchemy.dialects.postgresql import insert
 
 from src import config
 from src.entities import Role
+from src.middlewares.db_transaction import call_after_commit
 from src.services.base import BaseService
-from src.tables import user_credentials, user_tokens, users
+from src.tables import user_credentials, user_tokens, users, user_token_revocations
+
+SIGNED_TOKEN_PREFIX = "v1."
 
 
 def calculate_hash(password: str) -> bytes:
@@ -25,6 +32,90 @@ def generate_token() -> str:
     return str(uuid.uuid4())
 
 
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(config.AUTH_TOKEN_SECRET, payload.encode(), hashlib.sha256).digest())
+
+
+def generate_signed_token(user_id: int, role: Role) -> str:
+    issued_at = now_ms()
+    expires_at = issued_at + config.AUTH_TOKEN_TTL * 1000
+    payload = _b64encode(f"{user_id}:{role.value}:{issued_at}:{expires_at}".encode())
+    return f"{SIGNED_TOKEN_PREFIX}{payload}.{_sign(payload)}"
+
+
+@dataclass
+class SignedTokenPayload:
+    user_id: int
+    role: Role
+    issued_at: int
+    expires_at: int
+
+
+def verify_signed_token(token: str) -> "SignedTokenPayload | None":
+    """Check signature and expiry of signed token without database queries."""
+    if not config.AUTH_TOKEN_SECRET:
+        return None
+
+    try:
+        payload, signature = token.removeprefix(SIGNED_TOKEN_PREFIX).split(".")
+    except ValueError:
+        return None
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        return None
+
+    try:
+        user_id, role, issued_at, expires_at = _b64decode(payload).decode().split(":")
+        result = SignedTokenPayload(int(user_id), Role(role), int(issued_at), int(expires_at))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+    if result.expires_at <= now_ms():
+        return None
+    return result
+
+
+class TokenDenylist:
+    """
+    In-memory copy of tokens revocations: user id -> time (ms) before which user's signed tokens are invalid.
+    Only revocations younger than token TTL are kept, older ones can't affect unexpired tokens.
+    """
+
+    def __init__(self):
+        self._revoked_before: dict[int, int] = {}
+
+    def is_revoked(self, user_id: int, issued_at: int) -> bool:
+        return issued_at <= self._revoked_before.get(user_id, -1)
+
+    def revoke(self, user_id: int, revoked_before: int) -> None:
+        self._revoked_before[user_id] = max(revoked_before, self._revoked_before.get(user_id, -1))
+
+    def merge(self, revocations: dict[int, int], expired_before: int) -> None:
+        """
+        Add revocations loaded from database and drop ones made before expired_before.
+        Revocations made by this process after loading are kept, so loaded ones don't overwrite them.
+        """
+        merged = {u: t for u, t in self._revoked_before.items() if t > expired_before}
+        for user_id, revoked_before in revocations.items():
+            merged[user_id] = max(revoked_before, merged.get(user_id, -1))
+        self._revoked_before = merged
+
+
+token_denylist = TokenDenylist()
+
+
 class AuthService(BaseService):
     async def login(self, login: str, password: str) -> "LoginResult":
         user_record = (
@@ -40,6 +131,10 @@ class AuthService(BaseService):
             raise BadLoginCredentialsError("Неверные логин или пароль.")
         user_id, role = user_record
 
+        role = Role(role.lower())
+        if config.AUTH_SIGNED_TOKENS:
+            return LoginResult(generate_signed_token(user_id, role), role, user_id)
+
         token = generate_token()
         await self._db_conn.execute(
             insert(user_tokens)
@@ -53,6 +148,12 @@ class AuthService(BaseService):
         return LoginResult(token, role, user_id)
 
     async def authorize(self, token: str) -> "AuthResult":
+        if token.startswith(SIGNED_TOKEN_PREFIX):
+            payload = verify_signed_token(token)
+            if payload is None or token_denylist.is_revoked(payload.user_id, payload.issued_at):
+                return AuthResult(is_authorized=False)
+            return AuthResult(is_authorized=True, role=payload.role, user_id=payload.user_id)
+
         user_record = (
             await self._db_conn.execute(
                 select(users.c.id, users.c.role).join(user_tokens).where(user_tokens.c.token == token)
@@ -75,7 +176,35 @@ class AuthService(BaseService):
         if not auth.is_authorized:
             raise UnknownTokenError("Неизвестный токен авторизации.")
 
-        await self._db_conn.execute(delete(user_tokens).where(user_tokens.c.token == token))
+        if token.startswith(SIGNED_TOKEN_PREFIX):
+            await self.revoke_tokens(auth.user_id)
+        else:
+            await self._db_conn.execute(delete(user_tokens).where(user_tokens.c.token == token))
+
+    async def revoke_tokens(self, user_id: int) -> None:
+        """Invalidate all signed tokens of user issued up to now (logout, password change)."""
+        revoked_before = now_ms()
+        await self._db_conn.execute(
+            insert(user_token_revocations)
+            .values(user_id=user_id, revoked_before=revoked_before)
+            .on_conflict_do_update(
+                constraint=user_token_revocations.primary_key,
+                set_={user_token_revocations.c.revoked_before: revoked_before},
+            )
+        )
+        # Other processes see revocation after next denylist sync
+        call_after_commit(lambda: token_denylist.revoke(user_id, revoked_before))
+
+    async def sync_denylist(self) -> None:
+        expired_before = now_ms() - config.AUTH_TOKEN_TTL * 1000
+        records = (
+            await self._db_conn.execute(
+                select(user_token_revocations.c.user_id, user_token_revocations.c.revoked_before).where(
+                    user_token_revocations.c.revoked_before > expired_before
+                )
+            )
+        ).all()
+        token_denylist.merge(dict(records), expired_before)
 
     async def create_credentials(self, user_id: int, login: str, password: str) -> None:
         is_exists = await self._db_conn.scalar(select(exists().where(user_credentials.c.login == login)))
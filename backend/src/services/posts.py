@@ -1,35 +1,88 @@
+import array
+import base64
+import binascii
 import enum
+from dataclasses import dataclass
+from datetime import datetime as Datetime, timedelta as Timedelta, timezone as Timezone
 
 from PIL.Image import Image
-from sqlalchemy import select, update, delete, exists
+from sqlalchemy import (
+    select,
+    update,
+    delete,
+    exists,
+    bindparam,
+    func,
+    literal,
+    literal_column,
+    cast,
+    extract,
+    and_,
+    or_,
+    column,
+    union_all,
+    values,
+    DateTime,
+    Float,
+    Integer,
+)
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.sql.functions import count
+from sqlalchemy.sql.expression import text as sql_text
 
-from src.entities import Post, RateKind, PostRate
+from src import config
+from src.entities import Post, RateKind, RatedPost
+from src.event_hub import event_hub
 from src.image_storage import ImageStorage
+from src.mapping import RowMapper, enum_converter
+from src.middlewares.db_transaction import call_after_commit, call_after_rollback
+from src.rated_posts_index import rated_posts_index, intersect
 from src.services.base import BaseService
 from src.services.users import UnknownUserError
-from src.tables import posts, post_rates, users
+from src.tables import posts, post_rates, users, posts_fts, posts_search_vector, ts_config
 
 
-def record_to_post(r) -> Post:
-    return Post(
-        id=r._mapping["id"],
-        created_at=r._mapping["created_at"],
-        text=r._mapping["text"],
-        image_url=r._mapping["image_url"],
-        likes_quantity=r._mapping["likes_quantity"],
-        dislikes_quantity=r._mapping["dislikes_quantity"],
-    )
+to_rate_kind = enum_converter(RateKind)
 
+_RATED_POST_MAPPER = RowMapper(RatedPost)
+_FOUND_POST_MAPPER = RowMapper(RatedPost, columns={"rate": "user_rate"}, converters={"rate": to_rate_kind})
 
-def record_to_post_rate(r) -> PostRate:
-    return PostRate(
-        id=r._mapping["id"],
-        post_id=r._mapping["post_id"],
-        user_id=r._mapping["user_id"],
-        rate=RateKind(r._mapping["rate"].lower()),
-    )
+
+def utc_now() -> Datetime:
+    # Posts creation time is stored as naive UTC datetime
+    return Datetime.now(Timezone.utc).replace(tzinfo=None)
+
+
+def calculate_hot_score(likes: int, dislikes: int, created_at: Datetime, now: Datetime) -> float:
+    age_hours = max((now - created_at).total_seconds(), 0) / 3600
+    return (likes - dislikes + 1) / (age_hours + 2) ** config.HOT_SCORE_GRAVITY
+
+
+def hot_score_sql(dialect: str, now: Datetime, likes=posts.c.likes_quantity, dislikes=posts.c.dislikes_quantity):
+    """calculate_hot_score as SQL expression over posts row, so score is computed from counters being updated."""
+    now = literal(now, DateTime)
+    if dialect == "sqlite":
+        age_hours = func.max((func.julianday(now) - func.julianday(posts.c.created_at)) * 24, 0)
+    else:
+        age_hours = func.greatest(cast(extract("epoch", now - posts.c.created_at), Float) / 3600.0, 0)
+    return (likes - dislikes + 1) / func.power(age_hours + 2, config.HOT_SCORE_GRAVITY, type_=Float)
+
+
+def rate_deltas(old_rate: RateKind | None, new_rate: RateKind | None) -> tuple[int, int]:
+    """Post likes and dislikes counters changes when user rate is changed from old to new."""
+    likes, dislikes = 0, 0
+
+    if old_rate == RateKind.LIKE:
+        likes -= 1
+    elif old_rate == RateKind.DISLIKE:
+        dislikes -= 1
+
+    if new_rate == RateKind.LIKE:
+        likes += 1
+    elif new_rate == RateKind.DISLIKE:
+        dislikes += 1
+
+    return likes, dislikes
 
 
 def prepare_image(image: Image) -> Image:
@@ -40,32 +93,102 @@ class PostsSorter(str, enum.Enum):
     MORE_LIKES_FIRST = "more_likes_first"
     MODE_DISLIKES_FIRST = "more_dislikes_first"
     NEW_FIRST = "new_first"
+    HOT = "hot"
+
+
+@dataclass
+class SearchCursor:
+    """Keyset pagination position: rank and id of the last returned post."""
+
+    rank: float
+    post_id: int
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(f"{self.rank!r}:{self.post_id}".encode()).decode()
+
+    @classmethod
+    def decode(cls, value: str) -> "SearchCursor":
+        try:
+            rank, post_id = base64.urlsafe_b64decode(value.encode()).decode().split(":")
+            return cls(float(rank), int(post_id))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise BadSearchCursorError("Неверный курсор поиска.")
+
+
+@dataclass(slots=True)
+class FoundPost:
+    post: RatedPost
+    rank: float
+
+
+def fts5_query(query: str) -> str:
+    # Quote every term to make user input safe for FTS5 query syntax
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
 
 
 class PostsService(BaseService):
-    async def get_list(self, limit: int, offset: int, order: PostsSorter) -> list[Post]:
+    async def get_list(self, limit: int, offset: int, order: PostsSorter) -> list[RatedPost]:
+        """Posts page, rates of posts are left unset."""
         if order == PostsSorter.NEW_FIRST:
-            order_by = posts.c.created_at.desc()
+            order_by = [posts.c.created_at.desc()]
         elif order == PostsSorter.MORE_LIKES_FIRST:
-            order_by = posts.c.likes_quantity.desc()
+            order_by = [posts.c.likes_quantity.desc()]
+        elif order == PostsSorter.HOT:
+            order_by = [posts.c.hot_score.desc(), posts.c.id.desc()]
         else:
-            order_by = posts.c.dislikes_quantity.desc()
+            order_by = [posts.c.dislikes_quantity.desc()]
 
-        stmt = select(posts).order_by(order_by).limit(limit).offset(offset)
-        records = (await self._db_conn.execute(stmt)).all()
-        return [record_to_post(r) for r in records]
+        stmt = select(posts).order_by(*order_by).limit(limit).offset(offset)
+        return _RATED_POST_MAPPER.all(await self._db_conn.execute(stmt))
 
     async def get_total_quantity(self) -> int:
         return await self._db_conn.scalar(select(count(posts.c.id)))
 
     async def get_rates(self, *posts_ids: int, user_id: int) -> dict[int, RateKind]:
-        stmt = select(post_rates.c.post_id, post_rates.c.rate).join(users).join(posts).where(users.c.id == user_id)
-
-        if posts_ids:
-            stmt = stmt.where(posts.c.id.in_(posts_ids))
-
-        records = (await self._db_conn.execute(stmt)).all()
-        return {post_id: RateKind(rate.lower()) for post_id, rate in records}
+        """User rates of given posts, posts not rated by user are omitted."""
+        if not posts_ids:
+            return {}
+
+        rated_ids = await self._get_rated_posts_ids(user_id)
+        if rated_ids is not None:
+            # Only posts rated by user are queried, for most users there are none
+            posts_ids = intersect(posts_ids, rated_ids)
+            if not posts_ids:
+                return {}
+
+        records = (
+            await self._db_conn.execute(
+                select(post_rates.c.post_id, post_rates.c.rate)
+                .join(users)
+                .join(posts)
+                .where(users.c.id == user_id)
+                .where(posts.c.id.in_(posts_ids))
+            )
+        ).all()
+        return {post_id: to_rate_kind(rate) for post_id, rate in records}
+
+    async def _get_rated_posts_ids(self, user_id: int) -> array.array | None:
+        """Sorted ids of posts rated by user, None if user has too many rates to be indexed."""
+        if not rated_posts_index.is_indexable(user_id):
+            return None
+
+        rated_ids = rated_posts_index.get(user_id)
+        if rated_ids is not None:
+            return rated_ids
+
+        ticket = rated_posts_index.begin_load(user_id)
+        try:
+            # One more id than index accepts tells that user can't be indexed
+            records = await self._db_conn.execute(
+                select(post_rates.c.post_id)
+                .where(post_rates.c.user_id == user_id)
+                .order_by(post_rates.c.post_id)
+                .limit(rated_posts_index.max_posts + 1)
+            )
+            rated_ids = array.array("i", records.scalars())
+        finally:
+            rated_posts_index.finish_load(user_id, ticket, rated_ids)
+        return rated_ids if len(rated_ids) <= rated_posts_index.max_posts else None
 
     async def create_post(self, text: str, image: Image) -> Post:
         image = prepare_image(image)
@@ -76,6 +199,7 @@ class PostsService(BaseService):
                 .values(
                     text=text,
                     image_url=image_url,
+                    hot_score=calculate_hot_score(0, 0, utc_now(), utc_now()),
                 )
                 .returning(
                     posts.c.id,
@@ -84,7 +208,14 @@ class PostsService(BaseService):
             )
         ).first()
         id_, created_at = post_record
-        return Post(
+
+        if self._db_conn.dialect.name == "sqlite":
+            await self._db_conn.execute(
+                sql_text("INSERT INTO posts_fts(rowid, text) VALUES (:id, :text)"),
+                {"id": id_, "text": text},
+            )
+
+        post = Post(
             id=id_,
             created_at=created_at,
             text=text,
@@ -92,12 +223,137 @@ class PostsService(BaseService):
             likes_quantity=0,
             dislikes_quantity=0,
         )
+        call_after_commit(lambda: event_hub.post_created(post))
+        return post
 
     async def delete_post(self, post_id: int) -> None:
-        if not await self._check_post_exists(post_id):
+        post_record = (
+            await self._db_conn.execute(
+                delete(posts).where(posts.c.id == post_id).returning(posts.c.text, posts.c.image_url)
+            )
+        ).first()
+        if post_record is None:
             raise UnknownPostError(f"Пост с идентификатором id={post_id} не существует.")
+        post_text, image_url = post_record
 
-        await self._db_conn.execute(delete(posts).where(posts.c.id == post_id))
+        if self._db_conn.dialect.name == "sqlite":
+            # External content FTS5 table requires original text to remove post from index
+            await self._db_conn.execute(
+                sql_text("INSERT INTO posts_fts(posts_fts, rowid, text) VALUES ('delete', :id, :text)"),
+                {"id": post_id, "text": post_text},
+            )
+
+        call_after_commit(lambda: event_hub.post_deleted(post_id))
+        call_after_commit(lambda: ImageStorage.delete_many_in_background([image_url]))
+
+    async def create_posts(self, items: list[tuple[str, Image]]) -> list[Post]:
+        """Create batch of posts with one multi-row insert, images are saved in one worker thread."""
+        images_urls = await ImageStorage.save_many([prepare_image(image) for _, image in items])
+        # Saved images aren't referenced by any post if transaction isn't committed
+        call_after_rollback(lambda: ImageStorage.delete_many_in_background(images_urls))
+        initial_score = calculate_hot_score(0, 0, utc_now(), utc_now())
+        records = (
+            await self._db_conn.execute(
+                insert(posts).returning(posts.c.id, posts.c.created_at, sort_by_parameter_order=True),
+                [
+                    {"text": text, "image_url": image_url, "hot_score": initial_score}
+                    for (text, _), image_url in zip(items, images_urls)
+                ],
+            )
+        ).all()
+
+        created_posts = [
+            Post(
+                id=id_,
+                created_at=created_at,
+                text=text,
+                image_url=image_url,
+                likes_quantity=0,
+                dislikes_quantity=0,
+            )
+            for (id_, created_at), (text, _), image_url in zip(records, items, images_urls)
+        ]
+
+        if self._db_conn.dialect.name == "sqlite":
+            await self._db_conn.execute(
+                sql_text("INSERT INTO posts_fts(rowid, text) VALUES (:id, :text)"),
+                [{"id": post.id, "text": post.text} for post in created_posts],
+            )
+
+        def publish():
+            for post in created_posts:
+                event_hub.post_created(post)
+
+        call_after_commit(publish)
+        return created_posts
+
+    async def delete_posts(self, posts_ids: list[int]) -> set[int]:
+        """Delete batch of posts with their images. Returns ids of deleted posts, unknown ids are skipped."""
+        records = (
+            await self._db_conn.execute(
+                delete(posts).where(posts.c.id.in_(posts_ids)).returning(posts.c.id, posts.c.text, posts.c.image_url)
+            )
+        ).all()
+        if not records:
+            return set()
+
+        if self._db_conn.dialect.name == "sqlite":
+            await self._db_conn.execute(
+                sql_text("INSERT INTO posts_fts(posts_fts, rowid, text) VALUES ('delete', :id, :text)"),
+                [{"id": id_, "text": text} for id_, text, _ in records],
+            )
+
+        deleted_ids = {id_ for id_, _, _ in records}
+        images_urls = [image_url for _, _, image_url in records]
+
+        def publish():
+            for post_id in deleted_ids:
+                event_hub.post_deleted(post_id)
+
+        call_after_commit(publish)
+        # Files are removed only when posts are surely deleted
+        call_after_commit(lambda: ImageStorage.delete_many_in_background(images_urls))
+        return deleted_ids
+
+    async def search(
+        self, query: str, limit: int, user_id: int, after: SearchCursor | None = None
+    ) -> list[FoundPost]:
+        """Find posts by text ordered by relevance (most relevant first)."""
+        if self._db_conn.dialect.name == "sqlite":
+            # FTS5 rank is bm25() value, the smaller the better
+            rank = -posts_fts.c.rank
+            stmt = (
+                select(posts, rank.label("search_rank"), post_rates.c.rate.label("user_rate"))
+                .select_from(posts_fts.join(posts, posts.c.id == posts_fts.c.rowid))
+                .where(literal_column("posts_fts").op("MATCH")(fts5_query(query)))
+            )
+        else:
+            ts_query = func.websearch_to_tsquery(ts_config, query)
+            rank = func.ts_rank(posts_search_vector, ts_query)
+            stmt = select(posts, rank.label("search_rank"), post_rates.c.rate.label("user_rate")).where(
+                posts_search_vector.op("@@")(ts_query)
+            )
+
+        stmt = stmt.outerjoin(
+            post_rates,
+            and_(post_rates.c.post_id == posts.c.id, post_rates.c.user_id == user_id),
+        )
+
+        if after is not None:
+            stmt = stmt.where(
+                or_(
+                    rank < after.rank,
+                    and_(rank == after.rank, posts.c.id < after.post_id),
+                )
+            )
+
+        stmt = stmt.order_by(rank.desc(), posts.c.id.desc()).limit(limit)
+        result = await self._db_conn.execute(stmt)
+        keys = tuple(result.keys())
+        records = result.all()
+        found_posts = _FOUND_POST_MAPPER.map(keys, records)
+        rank_index = keys.index("search_rank")
+        return [FoundPost(post, r[rank_index]) for post, r in zip(found_posts, records)]
 
     async def _check_post_exists(self, post_id: int) -> bool:
         return await self._db_conn.scalar(exists().where(posts.c.id == post_id).select())
@@ -115,29 +371,37 @@ class PostsService(BaseService):
             return
 
         # Post rates counters deltas
-        likes, dislikes = 0, 0
+        likes, dislikes = rate_deltas(old_rate, new_rate)
 
-        if old_rate == RateKind.LIKE:
-            likes -= 1
-        elif old_rate == RateKind.DISLIKE:
-            dislikes -= 1
-
-        if new_rate == RateKind.LIKE:
-            likes += 1
-        elif new_rate == RateKind.DISLIKE:
-            dislikes += 1
-
-        # Update post rates counters
-        await self._db_conn.execute(
-            update(posts)
-            .values(
-                likes_quantity=posts.c.likes_quantity + likes,
-                dislikes_quantity=posts.c.dislikes_quantity + dislikes,
-            )
-            .where(
-                posts.c.id == post_id,
+        # Update post rates counters and hot score in one statement, score is computed from new counters
+        likes_quantity, dislikes_quantity = (
+            await self._db_conn.execute(
+                update(posts)
+                .values(
+                    likes_quantity=posts.c.likes_quantity + likes,
+                    dislikes_quantity=posts.c.dislikes_quantity + dislikes,
+                    hot_score=hot_score_sql(
+                        self._db_conn.dialect.name,
+                        utc_now(),
+                        likes=posts.c.likes_quantity + likes,
+                        dislikes=posts.c.dislikes_quantity + dislikes,
+                    ),
+                )
+                .where(
+                    posts.c.id == post_id,
+                )
+                .returning(
+                    posts.c.likes_quantity,
+                    posts.c.dislikes_quantity,
+                )
             )
-        )
+        ).first()
+        call_after_commit(lambda: event_hub.counters_changed(post_id, likes_quantity, dislikes_quantity))
+
+        if new_rate is None:
+            call_after_commit(lambda: rated_posts_index.discard(user_id, post_id))
+        else:
+            call_after_commit(lambda: rated_posts_index.add(user_id, post_id))
 
         if new_rate is None:
             # Likes or dislike are reset
@@ -160,6 +424,110 @@ class PostsService(BaseService):
             )
         )
 
+    async def update_user_rates(self, user_id: int, new_rates: dict[int, RateKind | None]) -> set[int]:
+        """
+        Apply batch of user rates changes (post id -> new rate) with set-based statements.
+        Returns ids of known posts, changes of unknown ones are skipped.
+        """
+        posts_ids = list(new_rates)
+        known_ids = set(
+            (await self._db_conn.execute(select(posts.c.id).where(posts.c.id.in_(posts_ids)))).scalars()
+        )
+        old_rates = {
+            post_id: to_rate_kind(rate)
+            for post_id, rate in await self._db_conn.execute(
+                select(post_rates.c.post_id, post_rates.c.rate)
+                .where(post_rates.c.user_id == user_id)
+                .where(post_rates.c.post_id.in_(known_ids))
+            )
+        }
+
+        changed = {
+            post_id: new_rates[post_id] for post_id in known_ids if old_rates.get(post_id) != new_rates[post_id]
+        }
+        if not changed:
+            return known_ids
+
+        # Update post rates counters and hot scores with one statement joined with counters deltas
+        deltas_rows = [(post_id, *rate_deltas(old_rates.get(post_id), rate)) for post_id, rate in changed.items()]
+        deltas_columns = (column("post_id", Integer), column("likes", Integer), column("dislikes", Integer))
+        if self._db_conn.dialect.name == "sqlite":
+            # SQLite doesn't support column names in VALUES alias
+            deltas = union_all(
+                *(
+                    select(*(literal(value, c.type).label(c.name) for value, c in zip(row, deltas_columns)))
+                    for row in deltas_rows
+                )
+            ).subquery("deltas")
+        else:
+            deltas = values(*deltas_columns, name="deltas").data(deltas_rows)
+
+        counters = (
+            await self._db_conn.execute(
+                update(posts)
+                .where(posts.c.id == deltas.c.post_id)
+                .values(
+                    likes_quantity=posts.c.likes_quantity + deltas.c.likes,
+                    dislikes_quantity=posts.c.dislikes_quantity + deltas.c.dislikes,
+                    hot_score=hot_score_sql(
+                        self._db_conn.dialect.name,
+                        utc_now(),
+                        likes=posts.c.likes_quantity + deltas.c.likes,
+                        dislikes=posts.c.dislikes_quantity + deltas.c.dislikes,
+                    ),
+                )
+                .returning(posts.c.id, posts.c.likes_quantity, posts.c.dislikes_quantity)
+            )
+        ).all()
+
+        def publish():
+            for id_, likes, dislikes in counters:
+                event_hub.counters_changed(id_, likes, dislikes)
+            for post_id, rate in changed.items():
+                if rate is None:
+                    rated_posts_index.discard(user_id, post_id)
+                else:
+                    rated_posts_index.add(user_id, post_id)
+
+        call_after_commit(publish)
+
+        # Update user rates
+        reset_ids = [post_id for post_id, rate in changed.items() if rate is None]
+        if reset_ids:
+            await self._db_conn.execute(
+                delete(post_rates).where(post_rates.c.user_id == user_id).where(post_rates.c.post_id.in_(reset_ids))
+            )
+
+        set_rates = [
+            {"post_id": post_id, "user_id": user_id, "rate": rate}
+            for post_id, rate in changed.items()
+            if rate is not None
+        ]
+        if set_rates:
+            stmt = insert(post_rates).values(set_rates)
+            await self._db_conn.execute(
+                stmt.on_conflict_do_update(
+                    constraint=post_rates.primary_key,
+                    set_={post_rates.c.rate: stmt.excluded.rate},
+                )
+            )
+
+        return known_ids
+
+    async def rescore_hot(self) -> int:
+        """
+        Recalculate hot score of posts created within HOT_RESCORE_WINDOW days.
+        Older posts keep last calculated score until they are rated again.
+        """
+        # Score is computed by database from current counters, so concurrent rate changes aren't overwritten
+        now = utc_now()
+        result = await self._db_conn.execute(
+            update(posts)
+            .values(hot_score=hot_score_sql(self._db_conn.dialect.name, now))
+            .where(posts.c.created_at >= now - Timedelta(days=config.HOT_RESCORE_WINDOW))
+        )
+        return result.rowcount
+
 
 class BadPostImageError(Exception):
     ...
@@ -169,5 +537,9 @@ class UnknownPostError(Exception):
     ...
 
 
+class BadSearchCursorError(Exception):
+    ...
+
+
 class UnknownPostOrUserError(UnknownPostError, UnknownUserError):
     ...
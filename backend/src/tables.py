@@ -1,10 +1,14 @@
 import sqlalchemy as sa
 from sqlalchemy.ext.asyncio import AsyncEngine
 
+from src import config
 from src.entities import Role, RateKind
 
 metadata = sa.MetaData()
 
+# Literal (not bound) config, so it can be rendered into DDL of generated search vector column
+ts_config = sa.literal_column(f"'{config.SEARCH_TS_CONFIG}'::regconfig")
+
 users = sa.Table(
     "users",
     metadata,
@@ -29,6 +33,14 @@ user_tokens = sa.Table(
     sa.Column("token", sa.Text, unique=True),
 )
 
+# Signed tokens of user issued before revoked_before (unix time, ms) are invalid
+user_token_revocations = sa.Table(
+    "user_token_revocations",
+    metadata,
+    sa.Column("user_id", sa.Integer, sa.ForeignKey(users.c.id, ondelete="CASCADE"), primary_key=True),
+    sa.Column("revoked_before", sa.BigInteger, nullable=False, index=True),
+)
+
 posts = sa.Table(
     "posts",
     metadata,
@@ -38,6 +50,23 @@ posts = sa.Table(
     sa.Column("image_url", sa.Text, nullable=False),
     sa.Column("likes_quantity", sa.Integer, nullable=False, server_default="0"),
     sa.Column("dislikes_quantity", sa.Integer, nullable=False, server_default="0"),
+    sa.Column("hot_score", sa.Float, nullable=False, server_default="0"),
+    sa.Index("posts_hot_score_idx", "hot_score", "id"),
+    sa.Index("posts_created_at_idx", "created_at"),
+    sa.Index("posts_likes_quantity_idx", "likes_quantity"),
+    sa.Index("posts_dislikes_quantity_idx", "dislikes_quantity"),
+)
+
+# PostgreSQL only stored tsvector of posts.text with GIN index over it, created by upgrade_schema.
+# It isn't a column of posts table metadata, so SQLite schema and posts selects don't have it
+posts_search_vector = sa.literal_column("posts.search_vector")
+
+# SQLite FTS5 external content index over posts.text, kept in sync by PostsService
+posts_fts = sa.table(
+    "posts_fts",
+    sa.column("rowid", sa.Integer),
+    sa.column("text", sa.Text),
+    sa.column("rank", sa.Float),
 )
 
 post_rates = sa.Table(
@@ -46,9 +75,74 @@ post_rates = sa.Table(
     sa.Column("post_id", sa.Integer, sa.ForeignKey(posts.c.id, ondelete="CASCADE"), primary_key=True),
     sa.Column("user_id", sa.Integer, sa.ForeignKey(users.c.id, ondelete="CASCADE"), primary_key=True),
     sa.Column("rate", sa.Enum(RateKind), nullable=False),
+    # Primary key starts with post_id, so it doesn't help to find user's rates (e.g. to load rated posts index)
+    sa.Index("post_rates_user_id_idx", "user_id"),
+)
+
+
+# Indexes added to tables after their creation, create_all doesn't add them to existing tables
+_ADDED_INDEXES = (
+    "posts_hot_score_idx",
+    "posts_created_at_idx",
+    "posts_likes_quantity_idx",
+    "posts_dislikes_quantity_idx",
+    "post_rates_user_id_idx",
 )
 
 
 async def create_schema(engine: AsyncEngine) -> None:
     async with engine.begin() as conn:
         await conn.run_sync(metadata.create_all)
+        await upgrade_schema(conn)
+
+        if conn.dialect.name == "sqlite":
+            await create_sqlite_fts(conn)
+
+
+async def upgrade_schema(conn) -> None:
+    """Bring tables created by previous versions up to date, every step is idempotent."""
+    posts_columns = await conn.run_sync(lambda c: {column["name"] for column in sa.inspect(c).get_columns("posts")})
+    if "hot_score" not in posts_columns:
+        column_type = posts.c.hot_score.type.compile(dialect=conn.dialect)
+        await conn.execute(sa.text(f"ALTER TABLE posts ADD COLUMN hot_score {column_type} NOT NULL DEFAULT 0"))
+        await backfill_hot_score(conn)
+
+    if conn.dialect.name == "postgresql":
+        # Stored vector isn't recomputed for ranking of every matched post on every search
+        await conn.execute(
+            sa.text(
+                "ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS (to_tsvector({ts_config}, text)) STORED"
+            )
+        )
+        # Expression index of previous versions
+        await conn.execute(sa.text("DROP INDEX IF EXISTS posts_text_search_idx"))
+        await conn.execute(
+            sa.text("CREATE INDEX IF NOT EXISTS posts_search_vector_idx ON posts USING gin (search_vector)")
+        )
+
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in _ADDED_INDEXES:
+                await conn.execute(sa.schema.CreateIndex(index, if_not_exists=True))
+
+
+async def backfill_hot_score(conn) -> None:
+    # Imported here, as posts service depends on tables
+    from src.services.posts import hot_score_sql, utc_now
+
+    await conn.execute(sa.update(posts).values(hot_score=hot_score_sql(conn.dialect.name, utc_now())))
+
+
+async def create_sqlite_fts(conn) -> None:
+    is_exists = await conn.scalar(
+        sa.text("SELECT EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts')")
+    )
+    if is_exists:
+        return
+
+    await conn.execute(
+        sa.text("CREATE VIRTUAL TABLE posts_fts USING fts5(text, content='posts', content_rowid='id')")
+    )
+    # Index posts created before FTS table appeared
+    await conn.execute(sa.text("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')"))
@@ -24,6 +24,26 @@ class Requirement(Checker):
         ...
 
 
+def route_name(request: web.Request) -> str:
+    """Route identifier like "PUT /posts/{post_id}/rate", unknown paths share one name."""
+    resource = request.match_info.route.resource
+    return f"{request.method} {resource.canonical if resource is not None else '*'}"
+
+
+def long_living(handler):
+    """Mark handler of long-living WebSocket connections, exempted from admission control, deadlines and profiling."""
+    handler.long_living = True
+    return handler
+
+
+def is_long_living(request: web.Request) -> bool:
+    # Upgrade header alone is set by any client, so only real handshakes to marked handlers count
+    return (
+        getattr(request.match_info.handler, "long_living", False)
+        and web.WebSocketResponse().can_prepare(request).ok
+    )
+
+
 Handler = typing.Callable[[web.Request], typing.Awaitable[web.StreamResponse]]
 HandlerWithRequirements = typing.Callable[[web.Request, ...], typing.Awaitable[web.StreamResponse]]
 
@@ -7,7 +7,8 @@ from src.main import init
 
 def start():
     logging.basicConfig(level=logging.INFO)
-    web.run_app(init(), port=8080)
+    # Handlers of disconnected clients are cancelled, so their transactions are rolled back
+    web.run_app(init(), port=8080, handler_cancellation=True)
 
 
 if __name__ == "__main__":